@@ -0,0 +1,129 @@
+"""
+Compare pages/sec of the PDF extraction backends on generated PDFs.
+
+OCR is measured too when Tesseract is installed, over every page of the
+corpus as if none had a text layer.
+
+Run from the backend directory:
+    python -m benchmarks.pdf_extraction --documents 20 --pages 50
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from services.pdf_service import DEFAULT_BACKENDS, ExtractionBackend, OCRBackend, TesseractOCRBackend
+
+WORDS = (
+    "retrieval augmented generation vector index embedding document chunk "
+    "context model query answer latency throughput page layout text"
+).split()
+
+
+def make_pdf(page_lines: List[List[str]]) -> bytes:
+    """Build a minimal PDF with one Helvetica text stream per page."""
+    objects = []
+    page_count = len(page_lines)
+    # 1: catalog, 2: page tree, 3: font, then (page, content) pairs
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(page_count))
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    
+    for i, lines in enumerate(page_lines):
+        content_id = 5 + 2 * i
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 760 Td"]
+        for line in lines:
+            ops.append(f"({line}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    return bytes(out)
+
+
+def make_corpus(documents: int, pages: int, lines: int, seed: int = 0) -> List[bytes]:
+    """Generate a corpus of text PDFs with random word lines."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(documents):
+        page_lines = [
+            [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines)]
+            for _ in range(pages)
+        ]
+        corpus.append(make_pdf(page_lines))
+    return corpus
+
+
+def bench_backend(backend: ExtractionBackend, corpus: List[bytes], repeat: int) -> float:
+    """Return pages/sec for a backend over the corpus (best of `repeat` runs)."""
+    best = float("inf")
+    total_pages = 0
+    for _ in range(repeat):
+        total_pages = 0
+        start = time.perf_counter()
+        for content in corpus:
+            total_pages += len(backend.extract_pages(content))
+        best = min(best, time.perf_counter() - start)
+    return total_pages / best if best > 0 else float("inf")
+
+
+def bench_ocr(backend: OCRBackend, corpus: List[bytes], pages: int, repeat: int) -> float:
+    """Return pages/sec for an OCR engine run on every page of the corpus (best of `repeat` runs)."""
+    best = float("inf")
+    total_pages = 0
+    for _ in range(repeat):
+        total_pages = 0
+        start = time.perf_counter()
+        for content in corpus:
+            total_pages += len(backend.ocr_pages(content, list(range(pages))))
+        best = min(best, time.perf_counter() - start)
+    return total_pages / best if best > 0 else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    corpus = make_corpus(args.documents, args.pages, args.lines)
+    print(f"Corpus: {args.documents} documents x {args.pages} pages")
+    print(f"{'backend':<12}{'pages/sec':>12}")
+    for backend in DEFAULT_BACKENDS:
+        if not backend.is_available():
+            print(f"{backend.name:<12}{'unavailable':>12}")
+            continue
+        pages_per_sec = bench_backend(backend, corpus, args.repeat)
+        print(f"{backend.name:<12}{pages_per_sec:>12.1f}")
+    
+    ocr_backend = TesseractOCRBackend()
+    if not ocr_backend.is_available():
+        print(f"{ocr_backend.name:<12}{'unavailable':>12}")
+        return
+    pages_per_sec = bench_ocr(ocr_backend, corpus, args.pages, args.repeat)
+    print(f"{ocr_backend.name:<12}{pages_per_sec:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
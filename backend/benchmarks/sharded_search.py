@@ -0,0 +1,59 @@
+"""
+Measure scatter-gather search latency for different shard counts.
+
+Uses random vectors so Ollama is not needed. Run from the backend directory:
+    python -m benchmarks.sharded_search --chunks 500000 --shards 1 2 4 8
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from services.sharded_vector_service import ShardedVectorService
+
+
+def build_service(index_dir: str, num_shards: int, vectors: np.ndarray) -> ShardedVectorService:
+    """Fill each shard in memory with an equal slice of the corpus."""
+    service = ShardedVectorService(index_dir=index_dir, num_shards=num_shards)
+    for shard_id, part in enumerate(np.array_split(np.arange(len(vectors)), num_shards)):
+        service.shards[shard_id] = FAISS.from_embeddings(
+            [(f"chunk {i}", vectors[i].tolist()) for i in part],
+            service.embeddings,
+            metadatas=[{"source": "benchmark", "chunk_index": int(i)} for i in part],
+            normalize_L2=True,
+        )
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, args.chunks, args.queries)]
+
+    print(f"Corpus: {args.chunks} chunks x {args.dim} dims, k={args.k}")
+    print(f"{'shards':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for num_shards in args.shards:
+        with tempfile.TemporaryDirectory() as index_dir:
+            service = build_service(index_dir, num_shards, vectors)
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                service._search_scored(query, args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            service.executor.shutdown()
+        print(f"{num_shards:>6}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
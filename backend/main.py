@@ -1,7 +1,9 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -9,19 +11,20 @@ from dotenv import load_dotenv
 from services.rag_workflow import RAGWorkflow
 from services.pdf_service import PDFService
 from services.vector_service import VectorService
+from services.sharded_vector_service import ShardedVectorService
+from services.admission_control import (
+    AdmissionController,
+    AdmissionMiddleware,
+    ConcurrencyLimiter,
+    Deadline,
+    DeadlineExceeded,
+    TokenBucketRateLimiter,
+)
 
 load_dotenv()
 
 app = FastAPI(title="PDF RAG API", version="1.0.0")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
@@ -37,42 +40,118 @@ class DocumentResponse(BaseModel):
     document_count: int
 
 pdf_service = PDFService()
-vector_service = VectorService()
+vector_shards = int(os.getenv("VECTOR_SHARDS", "0"))
+if vector_shards > 0:
+    vector_service = ShardedVectorService(
+        index_dir=os.getenv("VECTOR_INDEX_DIR", "vector_index"),
+        num_shards=vector_shards
+    )
+else:
+    vector_service = VectorService()
 rag_workflow = RAGWorkflow(vector_service=vector_service)
 
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+admission = AdmissionController(
+    rate_limiter=TokenBucketRateLimiter(
+        rate_per_minute=float(os.getenv("RATE_LIMIT_PER_MINUTE", "60")),
+        burst=int(os.getenv("RATE_LIMIT_BURST", "10"))
+    ),
+    limiters={
+        "chat": ConcurrencyLimiter(
+            max_concurrent=int(os.getenv("CHAT_MAX_CONCURRENCY", "4")),
+            max_queue=int(os.getenv("CHAT_MAX_QUEUE", "16")),
+            queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+        ),
+        "ingest": ConcurrencyLimiter(
+            max_concurrent=int(os.getenv("INGEST_MAX_CONCURRENCY", "2")),
+            max_queue=int(os.getenv("INGEST_MAX_QUEUE", "4")),
+            queue_timeout=float(os.getenv("INGEST_QUEUE_TIMEOUT", "10"))
+        ),
+    },
+    timeouts={
+        "chat": float(os.getenv("CHAT_TIMEOUT_SECONDS", "60")),
+        "ingest": float(os.getenv("INGEST_TIMEOUT_SECONDS", "300")),
+    }
+)
+
+TRUST_CLIENT_ID_HEADER = os.getenv("TRUST_CLIENT_ID_HEADER", "false").lower() in ("1", "true", "yes")
+
+def client_id(scope: dict) -> str:
+    """
+    Identify the caller for rate limiting.
+    
+    Uses the peer address. The X-Client-ID header is only used when
+    TRUST_CLIENT_ID_HEADER is set, i.e. behind a gateway that sets it.
+    """
+    if TRUST_CLIENT_ID_HEADER:
+        for name, value in scope.get("headers", []):
+            if name == b"x-client-id" and value:
+                return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+# POST path -> (endpoint class, max request body bytes)
+ADMISSION_ROUTES = {
+    "/chat": ("chat", 1024 * 1024),
+    "/upload": ("ingest", MAX_UPLOAD_BYTES),
+}
+
+# Added before CORS so CORS stays outermost and rejections carry its headers
+app.add_middleware(AdmissionMiddleware, admission=admission, routes=ADMISSION_ROUTES, client_id=client_id)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+def request_deadline(request: Request) -> Deadline:
+    """Deadline set by AdmissionMiddleware when the request arrived."""
+    return request.state.deadline
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 @app.get("/")
 async def root():
     return {"message": "RAG API is running"}
 
 @app.post("/upload", response_model=DocumentResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(file: UploadFile = File(...), deadline: Deadline = Depends(request_deadline)):
     """Upload and process a PDF document."""
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
     try:
-        text = await pdf_service.extract_text(file)
+        # Extraction and indexing threads check the deadline themselves and are
+        # awaited to completion, so the ingest slot is held until they stop
+        text = await pdf_service.extract_text(file, deadline)
         if not text:
             raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
         
         chunks = pdf_service.chunk_text(text)
-        vector_service.add_documents(chunks, file.filename)
+        await asyncio.to_thread(vector_service.add_documents, chunks, file.filename, deadline)
         
         return DocumentResponse(
             message=f"Successfully processed {file.filename}",
-            document_count=vector_service.get_vector_size()
+            document_count=await asyncio.to_thread(vector_service.get_vector_size)
         )
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, deadline: Deadline = Depends(request_deadline)):
     """Chat with the RAG system."""
     try:
         response = await rag_workflow.process_message(
             message=request.message,
             session_id=request.session_id,
-            model=request.model
+            model=request.model,
+            deadline=deadline
         )
         
         return ChatResponse(
@@ -80,6 +159,8 @@ async def chat(request: ChatRequest):
             session_id=response["session_id"],
             # sources=response.get("sources", [])
         )
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
@@ -87,14 +168,21 @@ async def chat(request: ChatRequest):
 async def get_documents():
     """Get information about stored documents."""
     return {
-        "document_count": vector_service.get_vector_size(),
+        "document_count": await asyncio.to_thread(vector_service.get_vector_size),
         "available_models": ["llama2", "mistral", "codellama"]
     }
 
+@app.get("/stats")
+async def get_stats():
+    """Get vector store, query embedding cache and admission control statistics."""
+    stats = await asyncio.to_thread(vector_service.get_stats)
+    stats["admission"] = admission.get_stats()
+    return stats
+
 @app.delete("/documents")
 async def clear_documents():
     """Clear all stored documents."""
-    vector_service.clear_vector_store()
+    await asyncio.to_thread(vector_service.clear_vector_store)
     return {"message": "All documents cleared successfully"}
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its end-to-end deadline."""
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused before any work is done."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def to_response(self) -> JSONResponse:
+        headers = {"Retry-After": str(max(1, round(self.retry_after)))} if self.retry_after else None
+        return JSONResponse(status_code=self.status_code, content={"detail": self.detail}, headers=headers)
+
+
+class Deadline:
+    def __init__(self, timeout: float):
+        """
+        End-to-end deadline for a single request.
+
+        Args:
+            timeout: Seconds from now until the request must be finished
+        """
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str) -> None:
+        """Raise DeadlineExceeded if the deadline passed before `stage` starts."""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+    async def run(self, awaitable, stage: str):
+        """Await `awaitable`, cancelling it if the deadline passes first."""
+        if self.expired() and asyncio.iscoroutine(awaitable):
+            # Never started, close it so it is not reported as un-awaited
+            awaitable.close()
+        self.check(stage)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Deadline exceeded during {stage}")
+
+
+class TokenBucketRateLimiter:
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = 10000):
+        """
+        Per-client token bucket rate limiter.
+
+        Args:
+            rate_per_minute: Sustained requests per minute allowed per client
+            burst: Bucket size, i.e. requests a client may send back to back
+            max_clients: Least recently seen clients are forgotten beyond this many
+        """
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        # Ordered by last request, oldest first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, client_id: str) -> None:
+        """Take one token for client_id or raise AdmissionRejected (429)."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        if tokens < 1:
+            self._remember(client_id, tokens, now)
+            retry_after = (1 - tokens) / self.rate if self.rate > 0 else None
+            raise AdmissionRejected(429, "Rate limit exceeded", retry_after=retry_after)
+
+        self._remember(client_id, tokens - 1, now)
+
+    def _remember(self, client_id: str, tokens: float, now: float) -> None:
+        self._buckets[client_id] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        """
+        Concurrency cap with a bounded wait queue for one endpoint class.
+
+        Args:
+            max_concurrent: Requests allowed to run at the same time
+            max_queue: Requests allowed to wait for a slot; more are rejected at once
+            queue_timeout: Longest time a request may wait for a slot
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self, deadline: Deadline):
+        """Hold a concurrency slot for the duration of the block."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(503, "Server is busy, try again later", retry_after=1)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(
+                self._semaphore.acquire(),
+                timeout=min(self.queue_timeout, deadline.remaining())
+            )
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(503, "Timed out waiting for a free slot", retry_after=1)
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionController:
+    def __init__(self, rate_limiter: TokenBucketRateLimiter, limiters: Dict[str, ConcurrencyLimiter], timeouts: Dict[str, float]):
+        """
+        Admission control shared by all endpoints.
+
+        Args:
+            rate_limiter: Per-client rate limiter applied to every admitted request
+            limiters: Concurrency limiter per endpoint class (e.g. "chat", "ingest")
+            timeouts: End-to-end deadline in seconds per endpoint class
+        """
+        self.rate_limiter = rate_limiter
+        self.limiters = limiters
+        self.timeouts = timeouts
+
+    @asynccontextmanager
+    async def admit(self, endpoint_class: str, client_id: str):
+        """
+        Admit a request or raise AdmissionRejected without doing any work.
+
+        The deadline starts when the request arrives, so time spent queueing
+        counts against it.
+
+        Yields:
+            Deadline for the admitted request
+        """
+        deadline = Deadline(self.timeouts[endpoint_class])
+        self.rate_limiter.acquire(client_id)
+        async with self.limiters[endpoint_class].slot(deadline):
+            yield deadline
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: limiter.get_stats() for name, limiter in self.limiters.items()}
+
+
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app,
+        admission: AdmissionController,
+        routes: Dict[str, Tuple[str, Optional[int]]],
+        client_id: Callable[[dict], str]
+    ):
+        """
+        ASGI middleware that admits requests before their body is read.
+
+        Rate limits, the concurrency queue and the declared body size are all
+        checked before any of the body is received, and the body is cut off
+        once it grows past the limit or the client stalls past the deadline.
+        The request's Deadline is stored in request.state.deadline.
+
+        Args:
+            app: ASGI application to wrap
+            admission: Shared admission controller
+            routes: POST path to (endpoint class, max body bytes or None)
+            client_id: Function identifying the caller from the ASGI scope
+        """
+        self.app = app
+        self.admission = admission
+        self.routes = routes
+        self.client_id = client_id
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint_class, max_body = route
+        async with AsyncExitStack() as stack:
+            try:
+                if max_body is not None:
+                    self._check_content_length(scope, max_body)
+                deadline = await stack.enter_async_context(
+                    self.admission.admit(endpoint_class, self.client_id(scope))
+                )
+            except AdmissionRejected as exc:
+                await exc.to_response()(scope, receive, send)
+                return
+
+            scope.setdefault("state", {})["deadline"] = deadline
+            await self.app(scope, self._limit_body(receive, max_body, deadline), send)
+
+    @staticmethod
+    def _check_content_length(scope, max_body: int) -> None:
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    raise AdmissionRejected(400, "Invalid Content-Length header")
+                if length > max_body:
+                    raise AdmissionRejected(413, f"Request body exceeds {max_body} bytes")
+
+    @staticmethod
+    def _limit_body(receive, max_body: Optional[int], deadline: Deadline):
+        """
+        Wrap receive so bodies without (or lying about) Content-Length are cut
+        off too, and a client trickling its body cannot hold the slot past the
+        deadline. HTTPException passes through FastAPI's body parsing unchanged.
+        """
+        received = 0
+        body_done = False
+
+        async def limited_receive():
+            nonlocal received, body_done
+            if body_done:
+                # Later receives only wait for a disconnect
+                return await receive()
+            try:
+                message = await asyncio.wait_for(receive(), timeout=deadline.remaining())
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=408, detail="Timed out receiving the request body")
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if max_body is not None and received > max_body:
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {max_body} bytes")
+                body_done = not message.get("more_body", False)
+            return message
+
+        return limited_receive
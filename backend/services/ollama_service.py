@@ -1,19 +1,22 @@
 import ollama
 from typing import Optional
 
+from services.admission_control import Deadline
+
 class OllamaService:
-    def __init__(self, model: str = "llama2", host: str = "http://localhost:11434"):
+    def __init__(self, model: str = "llama2", host: Optional[str] = None):
         """
         Initialize Ollama service.
         
         Args:
             model: Default model to use
-            host: Ollama server host
+            host: Ollama server host; None uses OLLAMA_HOST or http://localhost:11434
         """
         self.model = model
         self.host = host
+        self.client = ollama.AsyncClient(host=host)
         
-    async def chat(self, prompt: str, system_prompt: Optional[str] = None, model: str = "llama2") -> str:
+    async def chat(self, prompt: str, system_prompt: Optional[str] = None, model: str = "llama2", deadline: Optional[Deadline] = None) -> str:
         """
         Generate response using Ollama model.
         
@@ -21,30 +24,35 @@ class OllamaService:
             prompt: User question/prompt
             system_prompt: Optional system prompt
             model: Model to use for generation
+            deadline: Optional request deadline; generation is cancelled once it passes
             
         Returns:
             Generated response
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes before Ollama answers
         """
         if system_prompt is None:
             system_prompt = """You are a helpful assistant that answers questions based on the provided context. 
             Use only the information from the context to answer questions. If the context doesn't contain 
             enough information to answer the question, say so politely."""
         
-        try:
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = ollama.chat(
-                model=model or self.model,
-                messages=messages
-            )
-            
-            return response['message']['content']
-            
-        except Exception as e:
-            return f"Error communicating with Ollama: {str(e)}"
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        # Cancelling the request closes the HTTP connection, which stops generation in Ollama
+        request = self.client.chat(
+            model=model or self.model,
+            messages=messages
+        )
+        if deadline is not None:
+            response = await deadline.run(request, "generation")
+        else:
+            response = await request
+        
+        return response['message']['content']
     
     def list_models(self) -> list:
         """List available models."""
@@ -1,37 +1,332 @@
+import asyncio
+import functools
+import hashlib
 import io
+import json
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from PyPDF2 import PdfReader
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+from services.admission_control import Deadline, DeadlineExceeded
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    from pdfminer.high_level import extract_pages as pdfminer_extract_pages
+    from pdfminer.layout import LTTextContainer
+except ImportError:
+    pdfminer_extract_pages = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+
+@functools.lru_cache(maxsize=None)
+def tesseract_installed() -> bool:
+    """Whether pytesseract can actually run the tesseract binary (checked once)."""
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+class ExtractionBackend(ABC):
+    """Base class for PDF text extraction backends."""
+    name = "base"
+    
+    @abstractmethod
+    def is_available(self) -> bool:
+        """Whether the libraries this backend needs are installed."""
+    
+    @abstractmethod
+    def extract_pages(self, content: bytes) -> List[str]:
+        """
+        Extract the text layer of every page.
+        
+        Args:
+            content: Raw PDF bytes
+            
+        Returns:
+            One string per page, empty for pages without a text layer
+            
+        Raises:
+            Exception: If the document cannot be parsed by this backend
+        """
+
+
+class OCRBackend(ABC):
+    """Base class for OCR engines used on pages without a text layer."""
+    name = "base"
+    
+    @abstractmethod
+    def is_available(self) -> bool:
+        """Whether the libraries and binaries this engine needs are installed."""
+    
+    @abstractmethod
+    def ocr_pages(self, content: bytes, page_indexes: List[int], deadline: Optional[Deadline] = None) -> Dict[int, str]:
+        """
+        Run OCR on selected pages.
+        
+        Args:
+            content: Raw PDF bytes
+            page_indexes: Zero-based indexes of the pages to recognise
+            deadline: Optional request deadline, checked before each page
+            
+        Returns:
+            Mapping of page index to recognised text
+        """
+
+
+class PdfiumBackend(ExtractionBackend):
+    """Native PDFium parser, much faster than pure-Python parsers on large documents."""
+    name = "pdfium"
+    
+    def is_available(self) -> bool:
+        return pdfium is not None
+    
+    def extract_pages(self, content: bytes) -> List[str]:
+        pdf = pdfium.PdfDocument(content)
+        try:
+            pages = []
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_bounded() or "")
+                textpage.close()
+                page.close()
+            return pages
+        finally:
+            pdf.close()
+
+
+class PdfMinerBackend(ExtractionBackend):
+    """Layout-aware pdfminer parser, keeps text boxes in reading order."""
+    name = "pdfminer"
+    
+    def is_available(self) -> bool:
+        return pdfminer_extract_pages is not None
+    
+    def extract_pages(self, content: bytes) -> List[str]:
+        pages = []
+        for layout in pdfminer_extract_pages(io.BytesIO(content)):
+            pages.append("".join(
+                element.get_text() for element in layout if isinstance(element, LTTextContainer)
+            ))
+        return pages
+
+
+class PyPDF2Backend(ExtractionBackend):
+    """Pure-Python PyPDF2 parser, always available as the last resort."""
+    name = "pypdf2"
+    
+    def is_available(self) -> bool:
+        return True
+    
+    def extract_pages(self, content: bytes) -> List[str]:
+        pdf_reader = PdfReader(io.BytesIO(content))
+        return [page.extract_text() or "" for page in pdf_reader.pages]
+
+
+class TesseractOCRBackend(OCRBackend):
+    """Local OCR for pages without a text layer (renders with PDFium, reads with Tesseract)."""
+    name = "tesseract"
+    
+    def __init__(self, dpi: int = 200, lang: str = "eng"):
+        self.scale = dpi / 72
+        self.lang = lang
+    
+    def is_available(self) -> bool:
+        return pdfium is not None and tesseract_installed()
+    
+    def ocr_pages(self, content: bytes, page_indexes: List[int], deadline: Optional[Deadline] = None) -> Dict[int, str]:
+        pdf = pdfium.PdfDocument(content)
+        try:
+            results = {}
+            for index in page_indexes:
+                if deadline is not None:
+                    deadline.check("OCR")
+                page = pdf[index]
+                image = page.render(scale=self.scale).to_pil()
+                results[index] = pytesseract.image_to_string(image, lang=self.lang)
+                page.close()
+            return results
+        finally:
+            pdf.close()
+
+
+DEFAULT_BACKENDS = [PdfiumBackend(), PdfMinerBackend(), PyPDF2Backend()]
+
 
 class PDFService:
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        backends: Optional[List[ExtractionBackend]] = None,
+        ocr_backend: Optional[OCRBackend] = None,
+        cache_size: int = 128,
+        cache_dir: Optional[str] = None,
+    ):
+        """
+        Initialize PDF service.
+        
+        Args:
+            backends: Extraction backends in order of preference
+            ocr_backend: OCR engine used for pages with no text layer
+            cache_size: Number of documents whose page text is kept in memory
+            cache_dir: Optional directory to persist page text across restarts
+        """
+        backends = DEFAULT_BACKENDS if backends is None else backends
+        self.backends = [backend for backend in backends if backend.is_available()]
+        ocr_backend = TesseractOCRBackend() if ocr_backend is None else ocr_backend
+        self.ocr_backend = ocr_backend if ocr_backend.is_available() else None
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self._page_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
     
-    async def extract_text(self, file) -> Optional[str]:
+    async def extract_text(self, file, deadline: Optional[Deadline] = None) -> Optional[str]:
         """
         Extract text from uploaded PDF file.
         
         Args:
             file: FastAPI UploadFile object
+            deadline: Optional request deadline, checked between extraction steps
             
         Returns:
             Extracted text as string, or None if failed
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes during extraction
         """
         try:
             content = await file.read()
-            pdf_reader = PdfReader(io.BytesIO(content))
-            text = ""
-            
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+            # The thread is awaited to completion and stops itself at the deadline,
+            # so the caller's concurrency slot covers all of its work
+            pages = await asyncio.to_thread(self.extract_pages, content, deadline)
+            text = "\n".join(page for page in pages if page)
             
             return text.strip() if text.strip() else None
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error processing PDF: {e}")
             return None
     
+    def extract_pages(self, content: bytes, deadline: Optional[Deadline] = None) -> List[str]:
+        """
+        Extract per-page text, using the page cache keyed by file hash.
+        
+        Args:
+            content: Raw PDF bytes
+            deadline: Optional request deadline, checked between backends and OCR pages
+            
+        Returns:
+            One string per page
+        """
+        file_hash = hashlib.sha256(content).hexdigest()
+        pages = self._cache_get(file_hash)
+        if pages is not None:
+            return pages
+        
+        pages = self._extract_with_backends(content, deadline)
+        
+        empty_pages = [index for index, page in enumerate(pages) if not page.strip()]
+        ocr_done = not empty_pages
+        if empty_pages and self.ocr_backend is not None:
+            try:
+                for index, page_text in self.ocr_backend.ocr_pages(content, empty_pages, deadline).items():
+                    pages[index] = page_text
+                ocr_done = True
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                print(f"Error running OCR: {e}")
+        
+        # Pages left blank because OCR was unavailable or failed are not cached,
+        # so the document is retried once OCR works
+        if ocr_done and any(page.strip() for page in pages):
+            self._cache_put(file_hash, pages)
+        return pages
+    
+    def _extract_with_backends(self, content: bytes, deadline: Optional[Deadline] = None) -> List[str]:
+        """Use the first backend able to parse this document."""
+        last_error = None
+        for backend in self.backends:
+            if deadline is not None:
+                deadline.check("text extraction")
+            try:
+                pages = backend.extract_pages(content)
+                if pages:
+                    return pages
+                print(f"Backend {backend.name} found no pages")
+            except Exception as e:
+                print(f"Backend {backend.name} failed: {e}")
+                last_error = e
+        raise last_error or ValueError("No PDF extraction backend available")
+    
+    def _cache_path(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{file_hash}.json")
+    
+    def _cache_get(self, file_hash: str) -> Optional[List[str]]:
+        with self._cache_lock:
+            pages = self._page_cache.get(file_hash)
+            if pages is not None:
+                self._page_cache.move_to_end(file_hash)
+                return list(pages)
+        
+        if self.cache_dir:
+            try:
+                with open(self._cache_path(file_hash), "r", encoding="utf-8") as f:
+                    pages = json.load(f)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError) as e:
+                # Unreadable or truncated cache file: treat as a miss, it is rewritten after extraction
+                print(f"Ignoring page cache file for {file_hash}: {e}")
+                return None
+            if isinstance(pages, list):
+                self._remember(file_hash, pages)
+                return list(pages)
+        return None
+    
+    def _cache_put(self, file_hash: str, pages: List[str]) -> None:
+        """Best-effort: a failed write is logged and never fails the extraction."""
+        self._remember(file_hash, pages)
+        if not self.cache_dir:
+            return
+        tmp_path = None
+        try:
+            # Write to a temp file and swap it in so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(pages, f)
+            os.replace(tmp_path, self._cache_path(file_hash))
+        except Exception as e:
+            print(f"Error writing page cache for {file_hash}: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    def _remember(self, file_hash: str, pages: List[str]) -> None:
+        with self._cache_lock:
+            self._page_cache[file_hash] = list(pages)
+            self._page_cache.move_to_end(file_hash)
+            while len(self._page_cache) > self.cache_size:
+                self._page_cache.popitem(last=False)
+    
     def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """
         Split text into chunks for better embedding.
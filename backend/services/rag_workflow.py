@@ -1,24 +1,47 @@
-from typing import Dict, Any, List
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables import RunnablePassthrough
+import asyncio
 import uuid
 
+from services.admission_control import Deadline
 from services.ollama_service import OllamaService
 from services.vector_service import VectorService
 
+NO_CONTEXT_RESPONSE = (
+    "I couldn't find anything relevant to your question in the uploaded documents. "
+    "Try rephrasing the question or upload a document that covers this topic."
+)
+
+@dataclass
 class RAGState:
-    def __init__(self):
-        self.messages: List = []
-        self.query: str = ""
-        self.context: List[str] = []
-        self.response: str = ""
-        self.session_id: str = ""
-        self.sources: List[str] = []
+    messages: List = field(default_factory=list)
+    query: str = ""
+    context: List[str] = field(default_factory=list)
+    response: str = ""
+    session_id: str = ""
+    model: str = "llama2"
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    deadline: Optional[Deadline] = None
 
 class RAGWorkflow:
-    def __init__(self, vector_service: VectorService):
+    def __init__(self, vector_service: VectorService, max_k: int = 4, min_score: float = 0.5, max_drop: float = 0.1):
+        """
+        Initialize the RAG workflow.
+        
+        Args:
+            vector_service: Vector store used for retrieval
+            max_k: Maximum number of chunks passed to the model
+            min_score: Minimum cosine similarity for a chunk to be used
+            max_drop: Stop retrieval at a cosine similarity drop larger than this
+        """
         self.vector_service = vector_service
+        self.max_k = max_k
+        self.min_score = min_score
+        self.max_drop = max_drop
         self.ollama_service = OllamaService()
         self.workflow = self._create_workflow()
         
@@ -29,55 +52,71 @@ class RAGWorkflow:
         # Add nodes
         workflow.add_node("retrieve", self._retrieve_documents)
         workflow.add_node("generate", self._generate_response)
+        workflow.add_node("no_context", self._no_context_response)
         workflow.add_node("format_response", self._format_response)
         
         # Add edges
         workflow.set_entry_point("retrieve")
-        workflow.add_edge("retrieve", "generate")
+        workflow.add_conditional_edges(
+            "retrieve",
+            self._route_after_retrieval,
+            {"generate": "generate", "no_context": "no_context"}
+        )
         workflow.add_edge("generate", "format_response")
+        workflow.add_edge("no_context", "format_response")
         workflow.add_edge("format_response", END)
         
         return workflow.compile()
     
     async def _retrieve_documents(self, state: RAGState) -> RAGState:
         """Retrieve relevant documents based on the query."""
-        try:
-            # Search for relevant documents
-            relevant_docs = self.vector_service.search(state.query, k=3)
-            state.context = relevant_docs['context']
-            state.sources = relevant_docs
-        except Exception as e:
-            print(f"Error retrieving documents: {e}")
-            state.context = []
-            state.sources = []
+        if state.deadline is not None:
+            state.deadline.check("retrieval")
+        
+        # Search off the event loop; the thread is awaited so the request's slot
+        # covers it, and the embedding client's timeout bounds how long it runs
+        relevant_docs = await asyncio.to_thread(
+            self.vector_service.search,
+            state.query,
+            k=self.max_k,
+            min_score=self.min_score,
+            max_drop=self.max_drop
+        )
+        
+        state.context = relevant_docs['context']
+        state.sources = relevant_docs['metadata']
+        state.scores = relevant_docs['scores']
+        
+        return state
+    
+    def _route_after_retrieval(self, state: RAGState) -> str:
+        """Only call the LLM when there is relevant context to answer from."""
+        return "generate" if state.context else "no_context"
+    
+    async def _no_context_response(self, state: RAGState) -> RAGState:
+        """Reply without calling the LLM when nothing relevant was retrieved."""
+        state.response = NO_CONTEXT_RESPONSE
         
         return state
     
     async def _generate_response(self, state: RAGState) -> RAGState:
         """Generate response using Ollama with retrieved context."""
-        try:
-            # Create context-aware prompt
-            # print(state.context)
-            context_text = "\n\n".join(state.context) if state.context else "No relevant context found."
-            
-            system_prompt = """You are a helpful assistant that answers questions based on the provided context. 
-            Use only the information from the context to answer questions. If the context doesn't contain 
-            enough information to answer the question, say so politely."""
-            
-            full_prompt = f"Context: {context_text}\n\nQuestion: {state.query}"
-            
-            # Generate response using Ollama
-            response = await self.ollama_service.chat(
-                prompt=full_prompt,
-                system_prompt=system_prompt,
-                model=getattr(state, 'model', 'llama2')
-            )
-            
-            state.response = response
-            
-        except Exception as e:
-            print(f"Error generating response: {e}")
-            state.response = f"Sorry, I encountered an error while processing your request: {str(e)}"
+        # Create context-aware prompt
+        context_text = "\n\n".join(state.context)
+        
+        system_prompt = """You are a helpful assistant that answers questions based on the provided context. 
+        Use only the information from the context to answer questions. If the context doesn't contain 
+        enough information to answer the question, say so politely."""
+        
+        full_prompt = f"Context: {context_text}\n\nQuestion: {state.query}"
+        
+        # Generate response using Ollama
+        state.response = await self.ollama_service.chat(
+            prompt=full_prompt,
+            system_prompt=system_prompt,
+            model=state.model,
+            deadline=state.deadline
+        )
         
         return state
     
@@ -89,27 +128,33 @@ class RAGWorkflow:
         
         return state
     
-    async def process_message(self, message: str, session_id: str = None, model: str = "llama2") -> Dict[str, Any]:
-        """Process a message through the RAG workflow."""
-        # Create initial state
-        state = RAGState()
-        state.query = message
-        state.session_id = session_id or str(uuid.uuid4())
-        state.model = model
-        
-        # Run the workflow
-        try:
-            final_state = await self.workflow.ainvoke(state)
+    async def process_message(self, message: str, session_id: str = None, model: str = "llama2", deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Process a message through the RAG workflow.
+        
+        Args:
+            message: User question
+            session_id: Optional session to continue
+            model: Ollama model used for generation
+            deadline: Optional request deadline; retrieval and generation are cancelled once it passes
             
-            return {
-                "response": final_state.response,
-                "session_id": final_state.session_id,
-                "sources": final_state.sources
-            }
-        except Exception as e:
-            print(f"Error in workflow: {e}")
-            return {
-                "response": f"Error processing message: {str(e)}",
-                "session_id": state.session_id,
-                "sources": []
-            }
\ No newline at end of file
+        Raises:
+            DeadlineExceeded: If the deadline passes before the workflow finishes
+        """
+        # Create initial state
+        state = RAGState(
+            query=message,
+            session_id=session_id or str(uuid.uuid4()),
+            model=model,
+            deadline=deadline
+        )
+        
+        # Run the workflow; errors propagate so the API can report them
+        final_state = await self.workflow.ainvoke(state)
+        
+        return {
+            "response": final_state["response"],
+            "session_id": final_state["session_id"],
+            "sources": final_state["sources"],
+            "scores": final_state["scores"]
+        }
@@ -0,0 +1,166 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain.schema import Document
+
+from services.admission_control import Deadline
+from services.vector_service import ReadWriteLock, VectorService, cosine_from_l2
+
+MANIFEST_FILE = "shards.json"
+
+
+def shard_for_source(source_name: str, num_shards: int) -> int:
+    """Map a document source to a shard with a hash that is stable across processes."""
+    digest = hashlib.md5(source_name.encode("utf-8")).hexdigest()
+    return int(digest, 16) % num_shards
+
+
+def shard_path(index_dir: str, shard_id: int) -> str:
+    return os.path.join(index_dir, f"shard_{shard_id:03d}")
+
+
+def read_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(index_dir: str, num_shards: int) -> None:
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"num_shards": num_shards}, f)
+
+
+def iter_shard_entries(store: FAISS):
+    """Yield (document, embedding) pairs stored in a FAISS shard."""
+    for position, docstore_id in store.index_to_docstore_id.items():
+        yield store.docstore.search(docstore_id), store.index.reconstruct(position)
+
+
+class ShardedVectorService(VectorService):
+    def __init__(self, index_dir: str, num_shards: int = 4, max_workers: Optional[int] = None, **kwargs):
+        """
+        Initialize a vector store partitioned across several FAISS shards.
+
+        Documents are assigned to a shard by a hash of their source name and
+        each shard is persisted in its own directory under index_dir. Searches
+        fan out to all shards in a thread pool (FAISS releases the GIL) and the
+        per-shard top-k lists are merged with a heap.
+
+        Args:
+            index_dir: Directory holding the persisted shard indexes
+            num_shards: Number of shards; must match an existing index_dir
+            max_workers: Search threads, defaults to one per shard
+            **kwargs: Passed through to VectorService
+        """
+        super().__init__(**kwargs)
+        manifest = read_manifest(index_dir)
+        if manifest is not None and manifest["num_shards"] != num_shards:
+            raise ValueError(
+                f"{index_dir} holds {manifest['num_shards']} shards, not {num_shards}; "
+                f"run `python -m tools.rebalance_shards {index_dir} {num_shards}` first"
+            )
+
+        self.index_dir = index_dir
+        self.num_shards = num_shards
+        self.shards: List[Optional[FAISS]] = [self._load_shard(shard_id) for shard_id in range(num_shards)]
+        self.shard_locks = [ReadWriteLock() for _ in range(num_shards)]
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or num_shards, thread_name_prefix="faiss-shard")
+        write_manifest(index_dir, num_shards)
+
+    def _load_shard(self, shard_id: int) -> Optional[FAISS]:
+        path = shard_path(self.index_dir, shard_id)
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            return None
+        return FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True, normalize_L2=True)
+
+    def add_documents(self, texts: List[str], source_name: str = "unknown", deadline: Optional[Deadline] = None) -> None:
+        if not texts:
+            return
+
+        shard_id = shard_for_source(source_name, self.num_shards)
+        text_embeddings = list(zip(texts, self._embed_documents(texts, deadline)))
+        metadatas = [
+            {
+                "source": source_name,
+                "chunk_index": idx,
+                "shard": shard_id
+            }
+            for idx in range(len(texts))
+        ]
+
+        with self.shard_locks[shard_id].write():
+            if deadline is not None:
+                deadline.check("indexing")
+            if self.shards[shard_id] is None:
+                self.shards[shard_id] = FAISS.from_embeddings(
+                    text_embeddings, self.embeddings, metadatas=metadatas, normalize_L2=True
+                )
+            else:
+                self.shards[shard_id].add_embeddings(text_embeddings, metadatas=metadatas)
+            self.shards[shard_id].save_local(shard_path(self.index_dir, shard_id))
+
+    def _search_shard(self, shard_id: int, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        with self.shard_locks[shard_id].read():
+            shard = self.shards[shard_id]
+            if shard is None:
+                return []
+            return shard.similarity_search_with_score_by_vector(embedding, k)
+
+    def _search_scored(self, query_embedding: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        """Scatter the query to every shard and merge the per-shard top-k by distance."""
+        shard_ids = [shard_id for shard_id, shard in enumerate(self.shards) if shard is not None]
+        if not shard_ids:
+            return []
+
+        embedding = query_embedding.tolist()
+        futures = [
+            self.executor.submit(self._search_shard, shard_id, embedding, k)
+            for shard_id in shard_ids
+        ]
+        # Each shard returns its hits sorted by ascending distance
+        merged = heapq.merge(*(future.result() for future in futures), key=lambda hit: hit[1])
+
+        return [(doc, cosine_from_l2(distance)) for doc, distance in itertools.islice(merged, k)]
+
+    def get_vector_size(self) -> int:
+        """Get the number of chunks across all shards."""
+        return sum(self._shard_sizes())
+
+    def _shard_sizes(self) -> List[int]:
+        sizes = []
+        for shard_id, lock in enumerate(self.shard_locks):
+            with lock.read():
+                shard = self.shards[shard_id]
+                sizes.append(0 if shard is None else shard.index.ntotal)
+        return sizes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-shard sizes along with the base vector store statistics."""
+        stats = super().get_stats()
+        stats["shards"] = self._shard_sizes()
+        return stats
+
+    def clear_vector_store(self) -> None:
+        """Clear all documents from every shard, including the persisted indexes."""
+        try:
+            with ExitStack() as stack:
+                # Always in shard order so concurrent clears cannot deadlock
+                for lock in self.shard_locks:
+                    stack.enter_context(lock.write())
+                for shard_id in range(self.num_shards):
+                    shutil.rmtree(shard_path(self.index_dir, shard_id), ignore_errors=True)
+                    self.shards[shard_id] = None
+        except Exception as e:
+            print(f"Error clearing shards: {e}")
@@ -1,16 +1,208 @@
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+import os
+import threading
+import time
+import unicodedata
+
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
 
+from services.admission_control import Deadline
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int = 1024):
+        """
+        Bounded LRU cache for query embeddings with in-flight deduplication.
+        
+        Args:
+            max_size: Maximum number of embeddings kept in memory
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.saved_seconds = 0.0
+        self.embed_seconds = 0.0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize query text so trivially different spellings share an entry."""
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+    
+    def get_or_compute(self, model: str, text: str, embed: Callable[[str], List[float]]) -> np.ndarray:
+        """
+        Return the cached embedding for (model, text), computing it at most once.
+        
+        Concurrent callers asking for the same key while it is being embedded
+        wait for the first caller's result instead of issuing their own call.
+        
+        Args:
+            model: Embedding model name, part of the cache key
+            text: Query text
+            embed: Function producing the embedding for the normalized text
+            
+        Returns:
+            Embedding as a float32 numpy vector
+        """
+        normalized = self.normalize(text)
+        key = (model, normalized)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+            
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+        
+        if not leader:
+            wait_start = time.perf_counter()
+            vector, elapsed = future.result()
+            waited = time.perf_counter() - wait_start
+            # Only the part of the leader's call this follower did not sit through is saved
+            with self._lock:
+                self.saved_seconds += max(0.0, elapsed - waited)
+            return vector
+        
+        start = time.perf_counter()
+        try:
+            vector = np.asarray(embed(normalized), dtype=np.float32)
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        elapsed = time.perf_counter() - start
+        
+        with self._lock:
+            self.embed_seconds += elapsed
+            self._entries[key] = (vector, elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result((vector, elapsed))
+        return vector
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate and latency counters for the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.shared
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_in_flight": self.shared,
+                "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0,
+                "embed_seconds": round(self.embed_seconds, 4),
+                "saved_seconds": round(self.saved_seconds, 4),
+            }
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; a waiting writer blocks new readers."""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def cosine_from_l2(distance: float) -> float:
+    """Convert FAISS squared L2 distance between unit vectors to cosine similarity."""
+    return 1.0 - float(distance) / 2.0
+
+
+def select_relevant(scored: List[Tuple[Any, float]], k: int, min_score: float, max_drop: float) -> List[Tuple[Any, float]]:
+    """
+    Keep the leading results until relevance falls off.
+    
+    Args:
+        scored: (item, relevance score) pairs sorted by descending relevance
+        k: Maximum number of results to keep
+        min_score: Results below this relevance are dropped
+        max_drop: Stop at the first score more than this far below the previous one
+        
+    Returns:
+        Selected (item, score) pairs, possibly empty
+    """
+    selected = []
+    previous = None
+    for item, score in scored[:k]:
+        if score < min_score:
+            break
+        if previous is not None and previous - score > max_drop:
+            break
+        selected.append((item, score))
+        previous = score
+    return selected
+
 
 class VectorService:
-    def __init__(self, collection_name: str = "pdf_documents"):
+    def __init__(
+        self,
+        collection_name: str = "pdf_documents",
+        query_cache_size: int = 1024,
+        embed_batch_size: int = 32,
+        embed_timeout: float = 30.0
+    ):
         """
         Initialize vector store with ChromaDB and sentence transformers.
         
         Args:
             collection_name: Name for the ChromaDB collection
+            query_cache_size: Maximum number of query embeddings to cache
+            embed_batch_size: Chunks embedded per Ollama call; deadlines are checked between batches
+            embed_timeout: Seconds before a single Ollama embedding call is abandoned
         """
         # self.client = chromadb.Client()
         # self.collection_name = collection_name
@@ -19,58 +211,97 @@ class VectorService:
         
         # self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
         self.vector_store = None
+        # Searches share the store, inserts and clears replace or mutate it
+        self.lock = ReadWriteLock()
+        self.embed_batch_size = embed_batch_size
         
         from langchain_ollama import OllamaEmbeddings
 
         # 1️⃣ Setup Ollama embeddings
         self.embeddings = OllamaEmbeddings(
             model="nomic-embed-text",
-            base_url="http://localhost:11434"  # make sure Ollama is running
+            base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434"),  # make sure Ollama is running
+            client_kwargs={"timeout": embed_timeout}
         )
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size)
 
         
-    def add_documents(self, texts: List[str], source_name: str = "unknown") -> None:
+    def add_documents(self, texts: List[str], source_name: str = "unknown", deadline: Optional[Deadline] = None) -> None:
+        """
+        Embed and index chunks from one document.
+        
+        Args:
+            texts: Chunks to index
+            source_name: Document name stored in each chunk's metadata
+            deadline: Optional request deadline; embedding stops between batches once it passes
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes, in which case nothing is indexed
+        """
         if not texts:
             return
 
-        documents = [
-            Document(
-                page_content=text,
-                metadata={
-                    "source": source_name,
-                    "chunk_index": idx
-                }
-            )
-            for idx, text in enumerate(texts)
+        text_embeddings = list(zip(texts, self._embed_documents(texts, deadline)))
+        metadatas = [
+            {
+                "source": source_name,
+                "chunk_index": idx
+            }
+            for idx in range(len(texts))
         ]
-        try:
+        with self.lock.write():
+            if deadline is not None:
+                deadline.check("indexing")
             if self.vector_store is None:
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
+                # Unit-normalized vectors make L2 distance a direct function of cosine similarity
+                self.vector_store = FAISS.from_embeddings(
+                    text_embeddings, self.embeddings, metadatas=metadatas, normalize_L2=True
+                )
             else:
-                self.vector_store.add_documents(documents)
+                self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
 
             # self.vector_store.save_local(self.persist_path)
-        except Exception as e:
-            raise (f"Error processing document: {str(e)}")
     
-    def search(self, query: str, k: int = 3) -> List[str]:
+    def _embed_documents(self, texts: List[str], deadline: Optional[Deadline] = None) -> List[List[float]]:
+        """Embed chunks in batches, outside any lock, stopping once the deadline passes."""
+        vectors = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            if deadline is not None:
+                deadline.check("embedding")
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + self.embed_batch_size]))
+        return vectors
+    
+    def search(self, query: str, k: int = 4, min_score: float = 0.5, max_drop: float = 0.1) -> Dict[str, Any]:
+        """
+        Retrieve up to k chunks, stopping at the score cliff or the relevance threshold.
+        
+        Args:
+            query: User question
+            k: Maximum number of chunks to return
+            min_score: Minimum cosine similarity for a chunk to be returned
+            max_drop: Largest allowed cosine similarity drop between consecutive results
             
-        if not query:
-            return []
-        try:
-            retriever = self.vector_store.as_retriever(search_type='similarity', search_kwargs={'k':4})
-            result = retriever.invoke(query)
-
-            context = [doc.page_content for doc in result]
-            metadata = [doc.metadata for doc in result]
+        Returns:
+            Dict with the query and parallel context, metadata and scores lists
+        """
+        results = {
+            'query': query,
+            'context': [],
+            'metadata': [],
+            'scores': []
+        }
+        # Nothing to search: skip embedding the query altogether
+        if not query or self.get_vector_size() == 0:
+            return results
+        query_embedding = self.embed_query(query)
+        scored = self._search_scored(query_embedding, k)
 
-            return {
-                'query': query,
-                'context': context,
-                'metadata': metadata
-            }
-        except Exception as e:
-            print(f"Error retrieving vector: {e}")
+        for doc, score in select_relevant(scored, k, min_score, max_drop):
+            results['context'].append(doc.page_content)
+            results['metadata'].append(doc.metadata)
+            results['scores'].append(float(score))
+        
+        return results
         # # query_embedding = self.embedding_model.encode([query])
         # query_embedding = self.embeddings.embed_documents([query])
         
@@ -81,11 +312,31 @@ class VectorService:
         
         # return results['documents'][0] if results['documents'] else []
     
+    def _search_scored(self, query_embedding: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        """Return the k nearest chunks with cosine similarity, most similar first."""
+        with self.lock.read():
+            if self.vector_store is None:
+                return []
+            scored = self.vector_store.similarity_search_with_score_by_vector(query_embedding.tolist(), k=k)
+        return [(doc, cosine_from_l2(distance)) for doc, distance in scored]
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query, reusing cached or in-flight embeddings for repeated questions."""
+        return self.query_cache.get_or_compute(self.embeddings.model, query, self.embeddings.embed_query)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get vector store and query embedding cache statistics."""
+        return {
+            "document_count": self.get_vector_size(),
+            "query_cache": self.query_cache.get_stats(),
+        }
+    
     def get_vector_size(self) -> int:
         """Get the number of documents in the collection."""
-        if self.vector_store is None:
-            return 0
-        return self.vector_store.index.ntotal
+        with self.lock.read():
+            if self.vector_store is None:
+                return 0
+            return self.vector_store.index.ntotal
     
     # def clear_all_collection(self,collection):
     #     all_ids = collection.get(include=["ids"])["ids"]
@@ -97,7 +348,8 @@ class VectorService:
         """Clear all documents from the collection."""
         try:
             # Clear collection safely
-            self.vector_store = None
+            with self.lock.write():
+                self.vector_store = None
         except Exception as e:
             print(f"Error clearing collection: {e}")
             
@@ -0,0 +1,93 @@
+"""
+Offline rebalance of a sharded FAISS index to a new shard count.
+
+Stored vectors are reused, so nothing is re-embedded. Stop the API before
+running, then start it again with the new shard count. Run from the backend
+directory:
+    python -m tools.rebalance_shards ./vector_index 8
+"""
+import argparse
+import os
+import shutil
+from collections import defaultdict
+from typing import List
+
+from langchain_community.vectorstores import FAISS
+from langchain_ollama import OllamaEmbeddings
+
+from services.sharded_vector_service import (
+    iter_shard_entries,
+    read_manifest,
+    shard_for_source,
+    shard_path,
+    write_manifest,
+)
+
+
+def rebalance(index_dir: str, num_shards: int, embeddings) -> List[int]:
+    """
+    Repartition every stored chunk across num_shards shards by source hash.
+
+    Args:
+        index_dir: Directory of the existing sharded index
+        num_shards: New number of shards
+        embeddings: Embeddings object stored with each shard (not called)
+
+    Returns:
+        Number of chunks in each new shard
+    """
+    manifest = read_manifest(index_dir)
+    if manifest is None:
+        raise ValueError(f"No sharded index found in {index_dir}")
+
+    entries = defaultdict(list)
+    for shard_id in range(manifest["num_shards"]):
+        path = shard_path(index_dir, shard_id)
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            continue
+        store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True, normalize_L2=True)
+        for doc, vector in iter_shard_entries(store):
+            target = shard_for_source(doc.metadata.get("source", "unknown"), num_shards)
+            entries[target].append((doc, vector))
+
+    # Build the new layout next to the old one and swap once it is complete
+    staging_dir = index_dir.rstrip(os.sep) + ".rebalance"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    sizes = []
+    for shard_id in range(num_shards):
+        shard_entries = entries.get(shard_id, [])
+        sizes.append(len(shard_entries))
+        if not shard_entries:
+            continue
+        store = FAISS.from_embeddings(
+            [(doc.page_content, vector.tolist()) for doc, vector in shard_entries],
+            embeddings,
+            metadatas=[{**doc.metadata, "shard": shard_id} for doc, _ in shard_entries],
+            normalize_L2=True,
+        )
+        store.save_local(shard_path(staging_dir, shard_id))
+    write_manifest(staging_dir, num_shards)
+
+    backup_dir = index_dir.rstrip(os.sep) + ".old"
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    os.rename(index_dir, backup_dir)
+    os.rename(staging_dir, index_dir)
+    shutil.rmtree(backup_dir)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index_dir")
+    parser.add_argument("num_shards", type=int)
+    parser.add_argument("--embedding-model", default="nomic-embed-text")
+    args = parser.parse_args()
+
+    embeddings = OllamaEmbeddings(model=args.embedding_model, base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+    sizes = rebalance(args.index_dir, args.num_shards, embeddings)
+    for shard_id, size in enumerate(sizes):
+        print(f"shard {shard_id:03d}: {size} chunks")
+
+
+if __name__ == "__main__":
+    main()
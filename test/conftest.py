@@ -0,0 +1,9 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+# Tests import services by module name (e.g. `pdf_service`) and via the
+# `services` package used by main.py, so both directories go on the path
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+sys.path.insert(0, os.path.abspath(os.path.join(BACKEND_DIR, "services")))
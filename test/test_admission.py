@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, Request
+from services.admission_control import (
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    ConcurrencyLimiter,
+    Deadline,
+    DeadlineExceeded,
+    TokenBucketRateLimiter,
+)
+
+# ----------------------
+# Tests for TokenBucketRateLimiter
+# ----------------------
+def test_rate_limiter_allows_burst_then_rejects():
+    limiter = TokenBucketRateLimiter(rate_per_minute=60, burst=3)
+    for _ in range(3):
+        limiter.acquire("client-a")
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        limiter.acquire("client-a")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.retry_after > 0
+
+def test_rate_limiter_is_per_client():
+    limiter = TokenBucketRateLimiter(rate_per_minute=60, burst=1)
+    limiter.acquire("client-a")
+    limiter.acquire("client-b")
+
+    with pytest.raises(AdmissionRejected):
+        limiter.acquire("client-a")
+
+# ----------------------
+# Tests for Deadline
+# ----------------------
+@pytest.mark.asyncio
+async def test_deadline_cancels_slow_work():
+    deadline = Deadline(0.05)
+    with pytest.raises(DeadlineExceeded):
+        await deadline.run(asyncio.sleep(1), "generation")
+
+@pytest.mark.asyncio
+async def test_expired_deadline_skips_work():
+    deadline = Deadline(0)
+    started = []
+
+    async def work():
+        started.append(True)
+
+    with pytest.raises(DeadlineExceeded):
+        await deadline.run(work(), "retrieval")
+    assert started == []
+
+# ----------------------
+# Tests for ConcurrencyLimiter
+# ----------------------
+@pytest.mark.asyncio
+async def test_limiter_rejects_when_queue_is_full():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=5)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot(Deadline(5)):
+            await release.wait()
+
+    running = asyncio.create_task(hold())
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+    assert limiter.active == 1
+    assert limiter.waiting == 1
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        async with limiter.slot(Deadline(5)):
+            pass
+    assert exc_info.value.status_code == 503
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert limiter.active == 0
+    assert limiter.rejected == 1
+
+@pytest.mark.asyncio
+async def test_limiter_times_out_queued_request():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot(Deadline(5)):
+            await release.wait()
+
+    running = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected):
+        async with limiter.slot(Deadline(5)):
+            pass
+    assert limiter.waiting == 0
+
+    release.set()
+    await running
+
+def test_rate_limiter_evicts_least_recently_seen_client():
+    limiter = TokenBucketRateLimiter(rate_per_minute=1, burst=1, max_clients=2)
+    limiter.acquire("client-a")
+    limiter.acquire("client-b")
+    with pytest.raises(AdmissionRejected):
+        limiter.acquire("client-a")  # refreshes client-a
+    limiter.acquire("client-c")      # evicts client-b
+
+    assert list(limiter._buckets) == ["client-a", "client-c"]
+    # An evicted client starts again with a full bucket, a retained one does not
+    limiter.acquire("client-b")
+    with pytest.raises(AdmissionRejected):
+        limiter.acquire("client-c")
+
+# ----------------------
+# Tests for AdmissionMiddleware
+# ----------------------
+@pytest.mark.asyncio
+async def test_middleware_times_out_stalled_body():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0, queue_timeout=1)
+    admission = AdmissionController(
+        TokenBucketRateLimiter(rate_per_minute=60, burst=10), {"ingest": limiter}, {"ingest": 0.05}
+    )
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    middleware = AdmissionMiddleware(app, admission, {"/upload": ("ingest", None)}, client_id=lambda scope: "client-a")
+    chunks = [{"type": "http.request", "body": b"partial", "more_body": True}]
+
+    async def stalling_receive():
+        if chunks:
+            return chunks.pop()
+        await asyncio.sleep(10)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/upload", "headers": [], "query_string": b""}
+    await asyncio.wait_for(middleware(scope, stalling_receive, send), timeout=1)
+
+    assert sent[0]["status"] == 408
+    assert limiter.active == 0
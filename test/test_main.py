@@ -0,0 +1,140 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.admission_control import (
+    ConcurrencyLimiter,
+    Deadline,
+    DeadlineExceeded,
+    TokenBucketRateLimiter,
+)
+
+
+class StubWorkflow:
+    def __init__(self, error=None):
+        self.error = error
+        self.deadlines = []
+
+    async def process_message(self, message, session_id=None, model="llama2", deadline=None):
+        self.deadlines.append(deadline)
+        if self.error:
+            raise self.error
+        return {"response": f"answer to {message}", "session_id": session_id or "new", "sources": [], "scores": []}
+
+class StubPDFService:
+    def __init__(self):
+        self.calls = 0
+
+    async def extract_text(self, file, deadline=None):
+        self.calls += 1
+        await file.read()
+        return "some extracted text"
+
+    def chunk_text(self, text):
+        return [text]
+
+class StubVectorService:
+    def __init__(self):
+        self.added = []
+
+    def add_documents(self, texts, source_name="unknown", deadline=None):
+        self.added.append((texts, source_name, deadline))
+
+    def get_vector_size(self):
+        return sum(len(texts) for texts, _, _ in self.added)
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "rag_workflow", StubWorkflow())
+    monkeypatch.setattr(main, "pdf_service", StubPDFService())
+    monkeypatch.setattr(main, "vector_service", StubVectorService())
+    # Fresh limiters per test so state and event loop bindings do not leak
+    monkeypatch.setattr(main.admission, "rate_limiter", TokenBucketRateLimiter(rate_per_minute=60, burst=100))
+    monkeypatch.setitem(main.admission.limiters, "chat", ConcurrencyLimiter(max_concurrent=4, max_queue=4, queue_timeout=1))
+    monkeypatch.setitem(main.admission.limiters, "ingest", ConcurrencyLimiter(max_concurrent=2, max_queue=2, queue_timeout=1))
+    return TestClient(main.app)
+
+def test_chat_passes_deadline_to_workflow(client):
+    response = client.post("/chat", json={"message": "hi", "session_id": "s1"})
+
+    assert response.status_code == 200
+    assert response.json() == {"response": "answer to hi", "session_id": "s1"}
+    assert isinstance(main.rag_workflow.deadlines[0], Deadline)
+
+def test_rate_limit_returns_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(main.admission, "rate_limiter", TokenBucketRateLimiter(rate_per_minute=6, burst=1))
+
+    assert client.post("/chat", json={"message": "one"}).status_code == 200
+    response = client.post("/chat", json={"message": "two"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+
+def test_client_id_header_is_ignored_by_default(client, monkeypatch):
+    monkeypatch.setattr(main.admission, "rate_limiter", TokenBucketRateLimiter(rate_per_minute=6, burst=1))
+
+    client.post("/chat", json={"message": "one"}, headers={"X-Client-ID": "a"})
+    response = client.post("/chat", json={"message": "two"}, headers={"X-Client-ID": "b"})
+
+    assert response.status_code == 429
+
+def test_full_queue_returns_503(client, monkeypatch):
+    monkeypatch.setitem(main.admission.limiters, "chat", ConcurrencyLimiter(max_concurrent=0, max_queue=0, queue_timeout=1))
+
+    response = client.post("/chat", json={"message": "hi"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert main.rag_workflow.deadlines == []
+
+def test_deadline_exceeded_returns_504(client, monkeypatch):
+    monkeypatch.setattr(main, "rag_workflow", StubWorkflow(error=DeadlineExceeded("Deadline exceeded during generation")))
+
+    response = client.post("/chat", json={"message": "hi"})
+
+    assert response.status_code == 504
+    assert "generation" in response.json()["detail"]
+
+def test_workflow_error_returns_500(client, monkeypatch):
+    monkeypatch.setattr(main, "rag_workflow", StubWorkflow(error=RuntimeError("ollama down")))
+
+    response = client.post("/chat", json={"message": "hi"})
+
+    assert response.status_code == 500
+    assert "ollama down" in response.json()["detail"]
+
+def test_upload_indexes_document(client):
+    response = client.post("/upload", files={"file": ("doc.pdf", b"%PDF-1.4 data", "application/pdf")})
+
+    assert response.status_code == 200
+    texts, source, deadline = main.vector_service.added[0]
+    assert (texts, source) == (["some extracted text"], "doc.pdf")
+    assert isinstance(deadline, Deadline)
+
+def test_oversized_upload_rejected_by_content_length(client, monkeypatch):
+    monkeypatch.setitem(main.ADMISSION_ROUTES, "/upload", ("ingest", 100))
+    monkeypatch.setattr(main.admission, "rate_limiter", TokenBucketRateLimiter(rate_per_minute=6, burst=1))
+
+    response = client.post("/upload", files={"file": ("doc.pdf", b"x" * 1000, "application/pdf")})
+
+    assert response.status_code == 413
+    assert main.pdf_service.calls == 0
+    # Rejected before admission, so no rate limit token was spent
+    assert client.post("/chat", json={"message": "hi"}).status_code == 200
+
+def test_oversized_streamed_upload_is_cut_off(client, monkeypatch):
+    monkeypatch.setitem(main.ADMISSION_ROUTES, "/upload", ("ingest", 100))
+
+    def body():
+        yield b"--boundary\r\n"
+        for _ in range(10):
+            yield b"x" * 50
+
+    response = client.post(
+        "/upload",
+        content=body(),
+        headers={"Content-Type": "multipart/form-data; boundary=boundary"},
+    )
+
+    assert response.status_code == 413
+    assert main.pdf_service.calls == 0
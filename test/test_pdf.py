@@ -1,6 +1,7 @@
+import hashlib
 import pytest
 import io
-from pdf_service import PDFService  # assuming your class is in pdf_service.py
+from pdf_service import ExtractionBackend, OCRBackend, PDFService  # assuming your class is in pdf_service.py
 from PyPDF2 import PdfWriter
 
 
@@ -66,3 +67,139 @@ def test_chunk_text_chunking():
     assert chunks[0] == "a" * 1000
     assert chunks[1] == "a" * 1000
     assert chunks[2] == "a" * 900
+
+# ----------------------
+# Tests for extraction backends
+# ----------------------
+class CountingBackend(ExtractionBackend):
+    name = "counting"
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = 0
+
+    def is_available(self):
+        return True
+
+    def extract_pages(self, content):
+        self.calls += 1
+        return list(self.pages)
+
+class FailingBackend(CountingBackend):
+    def extract_pages(self, content):
+        self.calls += 1
+        raise ValueError("cannot parse")
+
+class DummyOCR(OCRBackend):
+    def __init__(self):
+        self.requested = []
+
+    def is_available(self):
+        return True
+
+    def ocr_pages(self, content, page_indexes, deadline=None):
+        self.requested.extend(page_indexes)
+        return {index: f"scanned {index}" for index in page_indexes}
+
+def test_falls_back_to_next_backend():
+    failing = FailingBackend([])
+    working = CountingBackend(["page one"])
+    service = PDFService(backends=[failing, working], ocr_backend=DummyOCR())
+
+    assert service.extract_pages(b"%PDF") == ["page one"]
+    assert failing.calls == 1
+
+def test_ocr_only_runs_on_pages_without_text():
+    ocr = DummyOCR()
+    service = PDFService(backends=[CountingBackend(["text", "", "more"])], ocr_backend=ocr)
+
+    pages = service.extract_pages(b"%PDF")
+    assert ocr.requested == [1]
+    assert pages == ["text", "scanned 1", "more"]
+
+def test_reupload_uses_page_cache(tmp_path):
+    backend = CountingBackend(["cached text"])
+    service = PDFService(backends=[backend], ocr_backend=DummyOCR(), cache_dir=str(tmp_path))
+
+    service.extract_pages(b"%PDF same bytes")
+    service.extract_pages(b"%PDF same bytes")
+    assert backend.calls == 1
+
+    # A fresh service reads the persisted pages instead of re-extracting
+    restarted = PDFService(backends=[backend], ocr_backend=DummyOCR(), cache_dir=str(tmp_path))
+    assert restarted.extract_pages(b"%PDF same bytes") == ["cached text"]
+    assert backend.calls == 1
+
+def test_corrupt_cache_file_is_a_miss(tmp_path):
+    backend = CountingBackend(["fresh text"])
+    service = PDFService(backends=[backend], ocr_backend=DummyOCR(), cache_dir=str(tmp_path))
+    content = b"%PDF truncated cache"
+    file_hash = hashlib.sha256(content).hexdigest()
+    (tmp_path / f"{file_hash}.json").write_text('["half written', encoding="utf-8")
+
+    assert service.extract_pages(content) == ["fresh text"]
+    assert backend.calls == 1
+    # The bad file was replaced with a complete one
+    restarted = PDFService(backends=[backend], ocr_backend=DummyOCR(), cache_dir=str(tmp_path))
+    assert restarted.extract_pages(content) == ["fresh text"]
+    assert backend.calls == 1
+
+def test_textless_results_are_not_cached():
+    backend = CountingBackend(["", ""])
+
+    class NoOCR(DummyOCR):
+        def is_available(self):
+            return False
+
+    service = PDFService(backends=[backend], ocr_backend=NoOCR())
+    service.extract_pages(b"%PDF scanned")
+    service.extract_pages(b"%PDF scanned")
+    assert backend.calls == 2
+
+def test_pages_left_blank_without_ocr_are_not_cached():
+    backend = CountingBackend(["text", ""])
+
+    class NoOCR(DummyOCR):
+        def is_available(self):
+            return False
+
+    service = PDFService(backends=[backend], ocr_backend=NoOCR())
+    service.extract_pages(b"%PDF mixed")
+    service.extract_pages(b"%PDF mixed")
+    assert backend.calls == 2
+
+def test_pages_left_blank_after_failed_ocr_are_not_cached():
+    backend = CountingBackend(["text", ""])
+
+    class FailingOCR(DummyOCR):
+        def ocr_pages(self, content, page_indexes, deadline=None):
+            raise RuntimeError("tesseract crashed")
+
+    service = PDFService(backends=[backend], ocr_backend=FailingOCR())
+    assert service.extract_pages(b"%PDF mixed") == ["text", ""]
+    service.extract_pages(b"%PDF mixed")
+    assert backend.calls == 2
+
+def test_cache_write_failure_still_returns_pages(tmp_path, monkeypatch):
+    service = PDFService(backends=[CountingBackend(["text"])], ocr_backend=DummyOCR(), cache_dir=str(tmp_path))
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("pdf_service.tempfile.mkstemp", disk_full)
+    assert service.extract_pages(b"%PDF disk full") == ["text"]
+
+def test_tesseract_needs_binary(monkeypatch):
+    import pdf_service
+
+    class MissingBinary:
+        @staticmethod
+        def get_tesseract_version():
+            raise RuntimeError("tesseract is not installed or it's not in your PATH")
+
+    monkeypatch.setattr(pdf_service, "pytesseract", MissingBinary)
+    pdf_service.tesseract_installed.cache_clear()
+    try:
+        assert not pdf_service.TesseractOCRBackend().is_available()
+    finally:
+        pdf_service.tesseract_installed.cache_clear()
@@ -0,0 +1,73 @@
+import pytest
+from rag_workflow import RAGWorkflow, NO_CONTEXT_RESPONSE
+
+
+class StubVectorService:
+    def __init__(self, context):
+        self.context = context
+        self.calls = []
+
+    def search(self, query, k=4, min_score=0.5, max_drop=0.1):
+        self.calls.append({"query": query, "k": k, "min_score": min_score, "max_drop": max_drop})
+        return {
+            "query": query,
+            "context": list(self.context),
+            "metadata": [{"source": "doc.pdf", "chunk_index": i} for i in range(len(self.context))],
+            "scores": [0.9 - 0.01 * i for i in range(len(self.context))]
+        }
+
+class StubOllamaService:
+    def __init__(self, reply="stub answer"):
+        self.reply = reply
+        self.prompts = []
+
+    async def chat(self, prompt, system_prompt=None, model="llama2", deadline=None):
+        self.prompts.append(prompt)
+        return self.reply
+
+def make_workflow(context, **kwargs):
+    workflow = RAGWorkflow(vector_service=StubVectorService(context), **kwargs)
+    workflow.ollama_service = StubOllamaService()
+    return workflow
+
+@pytest.mark.asyncio
+async def test_no_context_skips_llm():
+    workflow = make_workflow([])
+
+    result = await workflow.process_message("What is in the report?", session_id="abc")
+
+    assert result["response"] == NO_CONTEXT_RESPONSE
+    assert result["session_id"] == "abc"
+    assert result["sources"] == []
+    assert workflow.ollama_service.prompts == []
+
+@pytest.mark.asyncio
+async def test_generates_when_context_found():
+    workflow = make_workflow(["Revenue grew 10% in 2024."])
+
+    result = await workflow.process_message("How much did revenue grow?")
+
+    assert result["response"] == "stub answer"
+    assert len(workflow.ollama_service.prompts) == 1
+    assert "Revenue grew 10% in 2024." in workflow.ollama_service.prompts[0]
+    assert "How much did revenue grow?" in workflow.ollama_service.prompts[0]
+    assert result["scores"] == [0.9]
+    assert result["session_id"]
+
+@pytest.mark.asyncio
+async def test_retrieval_settings_are_passed_to_search():
+    workflow = make_workflow(["chunk"], max_k=2, min_score=0.6, max_drop=0.05)
+
+    await workflow.process_message("question")
+
+    assert workflow.vector_service.calls == [
+        {"query": "question", "k": 2, "min_score": 0.6, "max_drop": 0.05}
+    ]
+
+def test_ollama_host_comes_from_environment(monkeypatch):
+    monkeypatch.setenv("OLLAMA_HOST", "http://ollama.internal:11434")
+    from ollama_service import OllamaService
+
+    service = OllamaService()
+
+    assert str(service.client._client.base_url).startswith("http://ollama.internal:11434")
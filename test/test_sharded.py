@@ -0,0 +1,137 @@
+import os
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from services.sharded_vector_service import (
+    ShardedVectorService,
+    iter_shard_entries,
+    shard_for_source,
+    shard_path,
+)
+from tools.rebalance_shards import rebalance
+
+
+class FixedEmbeddings(Embeddings):
+    """Maps known texts to fixed vectors so FAISS can be used without Ollama."""
+    model = "fixed"
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+def unit(angle):
+    return [float(np.cos(angle)), float(np.sin(angle))]
+
+def make_service(tmp_path, num_shards, vectors=None):
+    service = ShardedVectorService(index_dir=str(tmp_path / "index"), num_shards=num_shards)
+    service.embeddings = FixedEmbeddings(vectors or {})
+    return service
+
+def sources_on_distinct_shards(num_shards):
+    """Find one source name per shard."""
+    found = {}
+    i = 0
+    while len(found) < num_shards:
+        name = f"doc-{i}.pdf"
+        found.setdefault(shard_for_source(name, num_shards), name)
+        i += 1
+    return [found[shard_id] for shard_id in range(num_shards)]
+
+# ----------------------
+# Tests for shard_for_source
+# ----------------------
+def test_shard_for_source_is_stable_and_in_range():
+    for num_shards in (1, 3, 8):
+        for i in range(200):
+            shard = shard_for_source(f"file-{i}.pdf", num_shards)
+            assert 0 <= shard < num_shards
+            assert shard == shard_for_source(f"file-{i}.pdf", num_shards)
+
+# ----------------------
+# Tests for ShardedVectorService
+# ----------------------
+def test_search_merges_shards_into_global_top_k(tmp_path):
+    service = make_service(tmp_path, num_shards=2)
+    angles = {"a": 0.0, "b": 0.1, "c": 0.2, "d": 0.3, "e": 0.4, "f": 0.5}
+    # Interleave so the global top-k needs hits from both shards
+    layout = [["a", "c", "e"], ["b", "d", "f"]]
+    for shard_id, texts in enumerate(layout):
+        service.shards[shard_id] = FAISS.from_embeddings(
+            [(text, unit(angles[text])) for text in texts],
+            service.embeddings,
+            normalize_L2=True,
+        )
+
+    scored = service._search_scored(np.array(unit(0.0), dtype=np.float32), k=4)
+
+    assert [doc.page_content for doc, _ in scored] == ["a", "b", "c", "d"]
+    assert [score for _, score in scored] == pytest.approx([np.cos(a) for a in (0.0, 0.1, 0.2, 0.3)], abs=1e-5)
+
+def test_add_documents_persists_to_source_shard(tmp_path):
+    vectors = {"one": unit(0.0), "two": unit(0.2), "query": unit(0.0)}
+    service = make_service(tmp_path, num_shards=3, vectors=vectors)
+
+    service.add_documents(["one", "two"], "report.pdf")
+    shard_id = shard_for_source("report.pdf", 3)
+
+    assert service.get_stats()["shards"][shard_id] == 2
+    assert service.get_vector_size() == 2
+    assert os.path.exists(os.path.join(shard_path(service.index_dir, shard_id), "index.faiss"))
+
+    reloaded = make_service(tmp_path, num_shards=3, vectors=vectors)
+    result = reloaded.search("query", k=2, min_score=0.0, max_drop=1.0)
+    assert result["context"] == ["one", "two"]
+    assert result["metadata"][0]["shard"] == shard_id
+
+def test_manifest_mismatch_raises(tmp_path):
+    make_service(tmp_path, num_shards=2)
+
+    with pytest.raises(ValueError, match="rebalance"):
+        make_service(tmp_path, num_shards=4)
+
+def test_clear_removes_persisted_shards(tmp_path):
+    sources = sources_on_distinct_shards(2)
+    vectors = {"x": unit(0.0), "y": unit(1.0)}
+    service = make_service(tmp_path, num_shards=2, vectors=vectors)
+    service.add_documents(["x"], sources[0])
+    service.add_documents(["y"], sources[1])
+
+    service.clear_vector_store()
+
+    assert service.get_vector_size() == 0
+    for shard_id in range(2):
+        assert not os.path.exists(shard_path(service.index_dir, shard_id))
+    assert make_service(tmp_path, num_shards=2).get_vector_size() == 0
+
+# ----------------------
+# Tests for rebalance
+# ----------------------
+def test_rebalance_keeps_every_chunk_and_vector(tmp_path):
+    vectors = {f"chunk {i}": unit(0.1 * i) for i in range(12)}
+    service = make_service(tmp_path, num_shards=2, vectors=vectors)
+    for doc in range(4):
+        texts = [f"chunk {doc * 3 + j}" for j in range(3)]
+        service.add_documents(texts, f"doc-{doc}.pdf")
+
+    sizes = rebalance(service.index_dir, 3, service.embeddings)
+    assert sum(sizes) == 12
+
+    rebalanced = make_service(tmp_path, num_shards=3, vectors=vectors)
+    seen = {}
+    for shard_id, shard in enumerate(rebalanced.shards):
+        if shard is None:
+            continue
+        for doc, vector in iter_shard_entries(shard):
+            assert doc.metadata["shard"] == shard_id
+            assert shard_for_source(doc.metadata["source"], 3) == shard_id
+            seen[doc.page_content] = vector
+
+    assert sorted(seen) == sorted(vectors)
+    for text, vector in seen.items():
+        assert vector == pytest.approx(vectors[text], abs=1e-6)
@@ -0,0 +1,239 @@
+import threading
+import time
+import pytest
+from langchain_core.embeddings import Embeddings
+from vector_service import QueryEmbeddingCache, VectorService, select_relevant
+from services.admission_control import Deadline, DeadlineExceeded
+
+
+def test_cache_hit_skips_embedding():
+    cache = QueryEmbeddingCache(max_size=4)
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [1.0, 2.0]
+
+    first = cache.get_or_compute("nomic-embed-text", "What is RAG?", embed)
+    second = cache.get_or_compute("nomic-embed-text", "  What   is RAG? ", embed)
+
+    assert calls == ["What is RAG?"]
+    assert first.dtype.name == "float32"
+    assert second is first
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_cache_keys_include_model():
+    cache = QueryEmbeddingCache(max_size=4)
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [0.0]
+
+    cache.get_or_compute("model-a", "hello", embed)
+    cache.get_or_compute("model-b", "hello", embed)
+    assert len(calls) == 2
+
+def test_cache_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2)
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return [0.0]
+
+    cache.get_or_compute("m", "a", embed)
+    cache.get_or_compute("m", "b", embed)
+    cache.get_or_compute("m", "a", embed)  # "a" becomes most recent
+    cache.get_or_compute("m", "c", embed)  # evicts "b"
+    cache.get_or_compute("m", "a", embed)
+    cache.get_or_compute("m", "b", embed)
+
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.get_stats()["size"] == 2
+
+def test_concurrent_identical_queries_share_one_call():
+    cache = QueryEmbeddingCache(max_size=4)
+    calls = []
+    started = threading.Event()
+
+    def embed(text):
+        calls.append(text)
+        started.set()
+        time.sleep(0.1)
+        return [3.0]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("m", "q", embed)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("m", "q", embed)))
+        for _ in range(4)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert calls == ["q"]
+    assert len(results) == 5
+    assert cache.get_stats()["shared_in_flight"] + cache.get_stats()["hits"] == 4
+
+def test_failed_embedding_is_not_cached():
+    cache = QueryEmbeddingCache(max_size=4)
+
+    def failing(text):
+        raise RuntimeError("ollama down")
+
+    try:
+        cache.get_or_compute("m", "q", failing)
+    except RuntimeError:
+        pass
+
+    vector = cache.get_or_compute("m", "q", lambda text: [1.0])
+    assert vector.tolist() == [1.0]
+
+# ----------------------
+# Tests for select_relevant
+# ----------------------
+def test_select_relevant_respects_k():
+    scored = [("a", 0.9), ("b", 0.88), ("c", 0.86), ("d", 0.85)]
+    assert select_relevant(scored, k=2, min_score=0.3, max_drop=0.15) == scored[:2]
+
+def test_select_relevant_stops_at_score_cliff():
+    scored = [("a", 0.9), ("b", 0.85), ("c", 0.5), ("d", 0.48)]
+    selected = select_relevant(scored, k=4, min_score=0.3, max_drop=0.15)
+    assert [item for item, _ in selected] == ["a", "b"]
+
+def test_select_relevant_drops_weak_matches():
+    scored = [("a", 0.45), ("b", 0.35), ("c", 0.25)]
+    selected = select_relevant(scored, k=4, min_score=0.3, max_drop=0.15)
+    assert [item for item, _ in selected] == ["a", "b"]
+
+def test_select_relevant_empty_when_nothing_relevant():
+    assert select_relevant([("a", 0.1)], k=4, min_score=0.3, max_drop=0.15) == []
+    assert select_relevant([], k=4, min_score=0.3, max_drop=0.15) == []
+
+# ----------------------
+# Tests for VectorService.search
+# ----------------------
+class FixedEmbeddings(Embeddings):
+    """Maps known texts to fixed vectors so FAISS can be used without Ollama."""
+    model = "fixed"
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+def test_search_on_empty_index_does_not_embed(monkeypatch):
+    service = VectorService()
+
+    def fail(query):
+        raise AssertionError("query should not be embedded")
+
+    monkeypatch.setattr(service, "embed_query", fail)
+    result = service.search("anything")
+
+    assert result == {"query": "anything", "context": [], "metadata": [], "scores": []}
+
+def test_search_scores_are_cosine_similarity():
+    service = VectorService()
+    service.embeddings = FixedEmbeddings({
+        "same": [3.0, 0.0, 0.0],
+        "close": [1.0, 1.0, 0.0],
+        "orthogonal": [0.0, 0.0, 2.0],
+        "query": [1.0, 0.0, 0.0],
+    })
+    service.add_documents(["same", "close", "orthogonal"], "doc.pdf")
+
+    result = service.search("query", k=3, min_score=-1.0, max_drop=2.0)
+
+    assert result["context"] == ["same", "close", "orthogonal"]
+    assert result["scores"] == pytest.approx([1.0, 2 ** -0.5, 0.0], abs=1e-5)
+
+def test_search_drops_unrelated_chunks():
+    service = VectorService()
+    service.embeddings = FixedEmbeddings({
+        "relevant": [1.0, 0.1],
+        "unrelated": [0.0, 1.0],
+        "query": [1.0, 0.0],
+    })
+    service.add_documents(["relevant", "unrelated"], "doc.pdf")
+
+    result = service.search("query")
+
+    assert result["context"] == ["relevant"]
+
+# ----------------------
+# Tests for concurrent indexing
+# ----------------------
+class SlowEmbeddings(FixedEmbeddings):
+    def embed_documents(self, texts):
+        time.sleep(0.01)
+        return [[1.0, float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [1.0, float(len(text))]
+
+def test_concurrent_first_uploads_keep_all_documents():
+    service = VectorService()
+    service.embeddings = SlowEmbeddings({})
+
+    threads = [
+        threading.Thread(target=service.add_documents, args=([f"doc {i} chunk"], f"doc-{i}.pdf"))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service.get_vector_size() == 8
+
+def test_expired_deadline_stops_indexing():
+    service = VectorService(embed_batch_size=1)
+    calls = []
+
+    class CountingEmbeddings(SlowEmbeddings):
+        def embed_documents(self, texts):
+            calls.append(texts)
+            return super().embed_documents(texts)
+
+    service.embeddings = CountingEmbeddings({})
+
+    with pytest.raises(DeadlineExceeded):
+        service.add_documents(["a", "b", "c"], "doc.pdf", deadline=Deadline(0))
+
+    assert calls == []
+    assert service.get_vector_size() == 0
+
+def test_followers_are_not_credited_time_they_waited():
+    cache = QueryEmbeddingCache(max_size=4)
+    started = threading.Event()
+
+    def embed(text):
+        started.set()
+        time.sleep(0.2)
+        return [1.0]
+
+    leader = threading.Thread(target=cache.get_or_compute, args=("m", "q", embed))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=cache.get_or_compute, args=("m", "q", embed))
+    follower.start()
+    leader.join()
+    follower.join()
+
+    stats = cache.get_stats()
+    assert stats["shared_in_flight"] == 1
+    # The follower joined right after the call started, so it saved almost nothing
+    assert stats["saved_seconds"] < 0.1